@@ -1,75 +1,389 @@
 from gooey import Gooey, GooeyParser
-from PIL import Image
 import av
 
 from sims_reia import ReiaFile, ReiaFrame, write_reia_file, read_from_file
+from sims_reia import BlockCache, ReiaStreamError
+from sims_reia import preprocess
+from sims_reia.encoder import write_num_frames
 
+from fractions import Fraction
+import abc
+import argparse
+import json
+import math
+import os
 import sys
+import time
+import typing
+
+# Maps the user-facing resize quality names to libswscale interpolation modes.
+RESIZE_QUALITIES = {
+    "lanczos": "LANCZOS",
+    "bicubic": "BICUBIC",
+    "bilinear": "BILINEAR",
+    "area": "AREA",
+    "nearest": "POINT",
+}
+
+
+class ProgressReporter(abc.ABC):
+    """Reports progress through a number of frames, at most once every
+    `interval` seconds so printing doesn't slow down the actual work. All other
+    status and error messages go through `log` and `fail` so each reporter
+    controls everything that gets printed.
+
+    Subclasses implement `emit` to show the statistics in some format.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.total_frames = 0
+        self.frame_size = 0
+        self.start_time = time.monotonic()
+        self.last_emit_time = None
+
+    def start(self, total_frames: int, frame_size: int):
+        """Called once the amount of work is known, right before starting it.
+        `frame_size` is the size of a single uncompressed RGB frame, used for
+        the compression ratio."""
+        self.total_frames = total_frames
+        self.frame_size = frame_size
+        self.start_time = time.monotonic()
+        self.last_emit_time = None
+
+    def update(self, frames_done: int, reia_bytes: int):
+        """Called for every frame with the number of frames done so far and
+        the size of the .reia data they correspond to."""
+        now = time.monotonic()
+        if (
+            self.last_emit_time is not None
+            and now - self.last_emit_time < self.interval
+        ):
+            return
+        self.last_emit_time = now
+        self.emit(self.stats(frames_done, reia_bytes, now), finished=False)
+
+    def finish(
+        self, frames_done: int, reia_bytes: int, error: typing.Optional[str] = None
+    ):
+        stats = self.stats(frames_done, reia_bytes, time.monotonic())
+        stats["error"] = error
+        self.emit(stats, finished=True)
+
+    def log(self, message: str):
+        print(message, flush=True)
+
+    def fail(self, message: str, frames_done: int = 0, reia_bytes: int = 0):
+        """Reports an error that ends the run."""
+        self.log(f"[Error] {message}")
+        self.finish(frames_done, reia_bytes, error=message)
+
+    def stats(self, frames_done: int, reia_bytes: int, now: float) -> dict:
+        elapsed = now - self.start_time
+        frames_per_second = frames_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if frames_per_second > 0:
+            eta = max(self.total_frames - frames_done, 0) / frames_per_second
+        compression_ratio = None
+        if frames_done > 0 and reia_bytes > 0:
+            compression_ratio = frames_done * self.frame_size / reia_bytes
+        return {
+            "frames": frames_done,
+            "total_frames": self.total_frames,
+            "elapsed": elapsed,
+            "frames_per_second": frames_per_second,
+            "eta": eta,
+            "reia_bytes": reia_bytes,
+            "compression_ratio": compression_ratio,
+        }
+
+    @abc.abstractmethod
+    def emit(self, stats: dict, finished: bool):
+        pass
+
+
+def _format_stats(stats: dict) -> str:
+    text = (
+        f"{stats['frames_per_second']:.1f} frames/s, "
+        f"{stats['reia_bytes'] / 1024:.1f} KiB .reia"
+    )
+    if stats["compression_ratio"] is not None:
+        text += f", {stats['compression_ratio']:.1f}x compression"
+    if stats["eta"] is not None:
+        text += f", ETA {stats['eta']:.0f}s"
+    return text
+
+
+class GooeyProgressReporter(ProgressReporter):
+    """Prints lines matching the `progress_regex` given to Gooey."""
+
+    def emit(self, stats: dict, finished: bool):
+        # Errors have already been logged, and Gooey can't show progress out of
+        # zero frames.
+        if finished and stats["error"] is not None:
+            return
+        print(
+            f"progress: {stats['frames']}/{stats['total_frames']} "
+            f"({_format_stats(stats)})",
+            flush=True,
+        )
+
+
+class TerminalProgressReporter(ProgressReporter):
+    """Keeps overwriting a single status line in the terminal."""
+
+    def emit(self, stats: dict, finished: bool):
+        # The error has already been logged on its own line.
+        if finished and stats["error"] is not None:
+            return
+        end = "\n" if finished else ""
+        print(
+            f"\r{stats['frames']}/{stats['total_frames']} frames, "
+            f"{_format_stats(stats)}\033[K",
+            end=end,
+            flush=True,
+        )
+
+    def log(self, message: str):
+        # Don't leave the message on the end of the status line.
+        print(f"\r{message}\033[K", flush=True)
+
+
+class JsonLinesProgressReporter(ProgressReporter):
+    """Prints each update as a JSON object on its own line. Anything else is
+    printed to stderr so stdout stays machine-readable."""
+
+    def emit(self, stats: dict, finished: bool):
+        print(json.dumps({"finished": finished, **stats}), flush=True)
+
+    def log(self, message: str):
+        print(message, file=sys.stderr, flush=True)
+
+
+PROGRESS_REPORTERS = {
+    "gooey": GooeyProgressReporter,
+    "terminal": TerminalProgressReporter,
+    "json": JsonLinesProgressReporter,
+}
+
+
+def should_keep_frame(index: int, frame_rate_ratio: Fraction) -> bool:
+    """Whether the source frame at `index` survives decimating the video down by
+    `frame_rate_ratio` (output fps / source fps). The first frame is always kept
+    and after that a frame is kept each time the output frame count ticks over."""
+    if index == 0:
+        return True
+    return math.floor(index * frame_rate_ratio) != math.floor(
+        (index - 1) * frame_rate_ratio
+    )
 
 
 def run_converter_to_reia(args):
+    progress = PROGRESS_REPORTERS[args.progress]()
+
+    # Check the options up front so we don't leave a half-written file behind.
+    if args.block_cache_size is not None and args.block_cache_size < 1:
+        progress.fail(
+            f"Block cache size must be at least 1, got {args.block_cache_size}"
+        )
+        sys.exit(1)
+    try:
+        if args.color_reduction == "posterize":
+            preprocess.check_posterize_bits(args.posterize_bits)
+        elif args.color_reduction == "palette":
+            preprocess.check_num_colors(args.palette_colors)
+    except ValueError as e:
+        progress.fail(str(e))
+        sys.exit(1)
+
     try:
         container = av.open(args.input_video)
     except av.error.InvalidDataError:
-        print("[Error] Input file could not be opened as a video")
+        progress.fail("Input file could not be opened as a video")
         sys.exit(1)
 
     video = container.streams.video[0]
+    # Let libav decode using multiple threads.
+    video.thread_type = "AUTO"
 
     # Sims neighborhood previews needs .reia resolutions to be a square n by n.
-    needs_resize = False
     if args.resize:
         target_width = 192
         target_height = 192
-        needs_resize = True
     else:
         target_width = video.width
         target_height = video.height
-    print(f"Output resolution: {target_width}x{target_height}")
+    progress.log(f"Output resolution: {target_width}x{target_height}")
 
-    # This is really horrible but if `video.frames` returns 0 we iterate decoding
-    # the whole video once to get the number of frames.
+    # This is really horrible but if `video.frames` returns 0 we iterate over
+    # the packets of the whole video once to get the number of frames.
     num_frames = video.frames
     if num_frames == 0:
-        for _ in container.decode(video=0):
-            num_frames += 1
+        for packet in container.demux(video):
+            # The demuxer gives us an empty packet to flush at the end.
+            if packet.size > 0:
+                num_frames += 1
         container = av.open(args.input_video)
         video = container.streams.video[0]
-
-    def frame_generator():
-        for frame in container.decode(video=0):
-            print(f"progress: {frame.index}/{num_frames}")
-            as_image = frame.to_image()
-            if needs_resize:
-                as_image = as_image.resize(
-                    (target_width, target_height), resample=Image.Resampling.LANCZOS
-                )
-            yield ReiaFrame(as_image)
+        video.thread_type = "AUTO"
 
     fps = video.guessed_rate
     # Just assume a default fps if libav can't guess one :/
     if fps is None:
-        fps = 24
+        fps = Fraction(24)
+    fps = Fraction(fps)
+
+    # Drop frames to get down to the requested frame rate, if asked.
+    frame_rate_ratio = Fraction(1)
+    if args.fps is not None and args.fps < fps:
+        frame_rate_ratio = args.fps / fps
+        fps = args.fps
+        num_frames = sum(
+            1 for i in range(num_frames) if should_keep_frame(i, frame_rate_ratio)
+        )
+        progress.log(f"Output frame rate: {float(fps):g}")
+
+    interpolation = RESIZE_QUALITIES[args.resize_quality]
+
+    def to_output_image(frame):
+        # Have libav scale and convert straight to RGB at the output
+        # resolution instead of converting the full-size frame first.
+        return frame.to_image(
+            width=target_width,
+            height=target_height,
+            interpolation=interpolation,
+        )
+
+    def sample_output_images(max_samples):
+        """Gets output frames spread evenly across the whole video by seeking
+        to each of them, so only a few frames around each sample are decoded."""
+        sample_container = av.open(args.input_video)
+        sample_video = sample_container.streams.video[0]
+        sample_video.thread_type = "AUTO"
+        start_pts = sample_video.start_time or 0
+
+        samples = []
+        for output_index in preprocess.sample_evenly(range(num_frames), max_samples):
+            target_pts = start_pts + int(
+                Fraction(output_index) / fps / sample_video.time_base
+            )
+            # Seeking lands on the keyframe before the target, decode forward
+            # from there until we reach it.
+            sample_container.seek(target_pts, stream=sample_video)
+            for frame in sample_container.decode(sample_video):
+                if frame.pts is None or frame.pts >= target_pts:
+                    samples.append(to_output_image(frame))
+                    break
+        sample_container.close()
+        return samples
+
+    frames_written = 0
+
+    def frame_generator():
+        nonlocal frames_written
+        for i, frame in enumerate(container.decode(video)):
+            # Skip frames being dropped before doing any conversion on them.
+            if not should_keep_frame(i, frame_rate_ratio):
+                continue
+            progress.update(frames_written, output_file.tell())
+            frames_written += 1
+            yield ReiaFrame(to_output_image(frame))
+
+    frames = frame_generator()
+    if args.color_reduction == "posterize":
+        frames = preprocess.posterize_frames(frames, args.posterize_bits)
+    elif args.color_reduction == "palette":
+        # Build the palette from frames across the whole video so it still
+        # works for videos that e.g. fade in from black.
+        samples = sample_output_images(16)
+        if len(samples) == 0:
+            progress.fail("Could not read any frames to build a palette from")
+            sys.exit(1)
+        palette = preprocess.create_palette(samples, args.palette_colors)
+        frames = preprocess.palette_frames(frames, args.palette_colors, palette)
 
     reia_file = ReiaFile(
         width=target_width,
         height=target_height,
         frames_per_second=fps,
         num_frames=num_frames,
-        frames=frame_generator(),
+        frames=frames,
     )
-    with open(args.output_reia, "wb") as f:
-        write_reia_file(reia_file, f)
-    print(f"Wrote out {args.output_reia}")
+    # Re-use blocks encoded in previous runs if there is a cache file.
+    cache = None
+    if args.block_cache is not None:
+        cache_size = args.block_cache_size
+        if cache_size is None:
+            # Big enough to hold every block of this video, so a re-run can
+            # find all of them.
+            blocks_per_frame = math.ceil(target_width / 32) * math.ceil(
+                target_height / 32
+            )
+            cache_size = max(4096, num_frames * blocks_per_frame)
+        if os.path.exists(args.block_cache):
+            with open(args.block_cache, "rb") as f:
+                cache = BlockCache.load(f, max_entries=cache_size)
+        else:
+            cache = BlockCache(max_entries=cache_size)
+
+    progress.start(num_frames, target_width * target_height * 3)
+    with open(args.output_reia, "wb") as output_file:
+        write_reia_file(reia_file, output_file, cache)
+        # The frame count from the container is only an estimate, so put the
+        # real one in the header.
+        if frames_written != num_frames:
+            write_num_frames(output_file, frames_written)
+        progress.finish(frames_written, output_file.tell())
+
+    if cache is not None:
+        with open(args.block_cache, "wb") as f:
+            cache.save(f)
+        progress.log(f"Block cache: {cache.hits} hits, {cache.misses} misses")
+        if cache.misses > cache.max_entries:
+            progress.log(
+                f"[Warning] More blocks were encoded than fit in the block cache "
+                f"({cache.max_entries}), increase the block cache size to get "
+                f"more hits on the next run"
+            )
+
+    progress.log(f"Wrote out {args.output_reia}")
 
 
 def run_extract_from_reia(args):
+    progress = PROGRESS_REPORTERS[args.progress]()
     with open(args.input_reia, "rb") as f:
-        reia_file = read_from_file(f)
+        try:
+            reia_file = read_from_file(f, streaming=True)
+        except ValueError as e:
+            progress.fail(str(e))
+            sys.exit(1)
+        progress.start(reia_file.num_frames, reia_file.width * reia_file.height * 3)
+
+        frames_done = 0
+        try:
+            for i, frame in enumerate(reia_file.frames):
+                frame.image.save(f"{args.output_folder}/reia_frame{i:04}.png")
+                frames_done += 1
+                progress.update(frames_done, f.tell())
+        except ReiaStreamError as e:
+            # Keep the frames we managed to get out of a damaged file.
+            progress.log(f"Extracted the first {frames_done} frames")
+            progress.fail(str(e), frames_done, f.tell())
+            sys.exit(1)
+        progress.finish(frames_done, f.tell())
 
-        for i, frame in enumerate(reia_file.frames):
-            print(f"progress: {i}/{reia_file.num_frames}")
-            frame.image.save(f"{args.output_folder}/reia_frame{i:04}.png")
+
+def parse_frame_rate(value: str) -> Fraction:
+    """argparse type for frame rates such as `10`, `29.97` or `30000/1001`."""
+    try:
+        frame_rate = Fraction(value)
+    except (ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError(f"invalid frame rate: {value!r}")
+    if frame_rate <= 0:
+        raise argparse.ArgumentTypeError(
+            f"frame rate must be greater than 0, got {value!r}"
+        )
+    return frame_rate
 
 
 def initialize_convert_to_reia_parser(parser):
@@ -97,6 +411,64 @@ def initialize_convert_to_reia_parser(parser):
         ),
         widget="BlockCheckbox",
     )
+    input_group.add_argument(
+        "--resize-quality",
+        metavar="Resize quality",
+        choices=list(RESIZE_QUALITIES.keys()),
+        default="lanczos",
+        help=(
+            "The filter used when scaling the video down.\n"
+            "\n"
+            "lanczos is the sharpest, nearest is the fastest."
+        ),
+        widget="Dropdown",
+    )
+    input_group.add_argument(
+        "--fps",
+        metavar="Frame rate",
+        type=parse_frame_rate,
+        default=None,
+        help=(
+            "Drop frames to bring the video down to this frame rate, e.g. 10 "
+            "or 29.97.\n"
+            "\n"
+            "Leave empty to keep the frame rate of the input video."
+        ),
+    )
+
+    color_group = parser.add_argument_group("Color Reduction")
+    color_group.add_argument(
+        "--color-reduction",
+        metavar="Color reduction",
+        choices=["none", "posterize", "palette"],
+        default="none",
+        help=(
+            "Reduce the number of colors before encoding.\n"
+            "\n"
+            "This gives smaller .reia files that are faster to encode at the "
+            "cost of some color accuracy. posterize drops the low bits of each "
+            "color channel, palette maps every frame onto one shared palette."
+        ),
+        widget="Dropdown",
+    )
+    color_group.add_argument(
+        "--posterize-bits",
+        metavar="Posterize bits",
+        type=int,
+        default=5,
+        help="Bits kept per color channel when posterizing (1-8)",
+        widget="IntegerField",
+        gooey_options={"min": 1, "max": 8},
+    )
+    color_group.add_argument(
+        "--palette-colors",
+        metavar="Palette colors",
+        type=int,
+        default=64,
+        help="Number of colors in the shared palette (2-256)",
+        widget="IntegerField",
+        gooey_options={"min": 2, "max": 256},
+    )
 
     output_group = parser.add_argument_group("Output Options")
     output_group.add_argument(
@@ -109,6 +481,27 @@ def initialize_convert_to_reia_parser(parser):
             "default_file": "Neighborhood.reia",
         },
     )
+    output_group.add_argument(
+        "--block-cache",
+        metavar="Block cache file",
+        help=(
+            "Optional file to cache encoded blocks in.\n"
+            "\n"
+            "Speeds up converting the same or similar videos again."
+        ),
+        widget="FileSaver",
+    )
+    output_group.add_argument(
+        "--block-cache-size",
+        metavar="Block cache size",
+        type=int,
+        default=None,
+        help=(
+            "Maximum number of encoded blocks kept in the block cache file.\n"
+            "\n"
+            "Leave empty to fit every block of the video."
+        ),
+    )
 
 
 def initialize_extract_reia_frames_parser(parser):
@@ -130,7 +523,23 @@ def initialize_extract_reia_frames_parser(parser):
     )
 
 
-@Gooey(program_name="Sims2 .reia Tool", navigation="TABBED", default_size=(610, 680))
+def add_progress_argument(parser):
+    parser.add_argument(
+        "--progress",
+        choices=list(PROGRESS_REPORTERS.keys()),
+        default="gooey",
+        help="How to report progress: gooey, terminal or json (one object per line)",
+        gooey_options={"visible": False},
+    )
+
+
+@Gooey(
+    program_name="Sims2 .reia Tool",
+    navigation="TABBED",
+    default_size=(610, 680),
+    progress_regex=r"^progress: (?P<current>\d+)/(?P<total>\d+)",
+    progress_expr="current / total * 100",
+)
 def main():
     parser = GooeyParser(description="Tools for working with .reia files")
 
@@ -140,12 +549,14 @@ def main():
         "convert", prog="Convert video to .reia"
     )
     initialize_convert_to_reia_parser(convert_to_reia_parser)
+    add_progress_argument(convert_to_reia_parser)
     convert_to_reia_parser.set_defaults(func=run_converter_to_reia)
 
     extract_reia_parser = subparsers.add_parser(
         "extract", prog="Extract frames from .reia"
     )
     initialize_extract_reia_frames_parser(extract_reia_parser)
+    add_progress_argument(extract_reia_parser)
     extract_reia_parser.set_defaults(func=run_extract_from_reia)
 
     args = parser.parse_args()
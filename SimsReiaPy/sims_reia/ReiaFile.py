@@ -1,5 +1,12 @@
 from . import _read_uint32_le
-from .ReiaFrame import ReiaFrame, create_frame_reader
+from .ReiaFrame import (
+    ReiaFrame,
+    ReiaStreamError,
+    create_frame_reader,
+    create_streaming_frame_reader,
+    _read_exactly,
+)
+from io import BytesIO
 import typing
 
 
@@ -40,7 +47,17 @@ class ReiaFile:
         self.frames = frames
 
 
-def read_from_file(stream: typing.BinaryIO) -> ReiaFile:
+# "RIFF" + size, "Reiahead" + metadata size and then 24 bytes of metadata.
+HEADER_SIZE = 8 + 12 + 24
+
+
+def read_header(stream: typing.BinaryIO) -> typing.Tuple[int, int, int, int, int]:
+    """Reads the RIFF and Reiahead headers at the start of a .reia file.
+
+    Returns a tuple of
+    `(width, height, fps_numerator, fps_denominator, num_frames)` and leaves the
+    stream positioned at the first frame.
+    """
     # Assert that the file starts with the proper magic bytes.
     riff_file_magic = stream.read(4)
     if riff_file_magic != b"RIFF":
@@ -70,12 +87,51 @@ def read_from_file(stream: typing.BinaryIO) -> ReiaFile:
     # Frames per second.
     frames_per_second_numerator = _read_uint32_le(stream)
     frames_per_second_denominator = _read_uint32_le(stream)
+
+    # Read the expected number of frames.
+    num_frames = _read_uint32_le(stream)
+
+    return (
+        width,
+        height,
+        frames_per_second_numerator,
+        frames_per_second_denominator,
+        num_frames,
+    )
+
+
+def read_from_file(stream: typing.BinaryIO, streaming: bool = False) -> ReiaFile:
+    """Reads a .reia file from the stream.
+
+    With `streaming` set, the frames are read with create_streaming_frame_reader
+    so truncated files give a ReiaStreamError after the last complete frame.
+    The header is also read in full first, which works with pipes that return
+    less data than asked for.
+    """
+    header_stream = stream
+    if streaming:
+        header_data = _read_exactly(stream, HEADER_SIZE)
+        if len(header_data) != HEADER_SIZE:
+            raise ReiaStreamError(
+                f"Header truncated, expected {HEADER_SIZE} bytes got {len(header_data)}",
+                0,
+            )
+        header_stream = BytesIO(header_data)
+
+    (
+        width,
+        height,
+        frames_per_second_numerator,
+        frames_per_second_denominator,
+        num_frames,
+    ) = read_header(header_stream)
     frames_per_second = (
         float(frames_per_second_numerator) / frames_per_second_denominator
     )
 
-    # Read the expected number of frames.
-    num_frames = _read_uint32_le(stream)
-    frames = create_frame_reader(stream, width, height)
+    if streaming:
+        frames = create_streaming_frame_reader(stream, width, height)
+    else:
+        frames = create_frame_reader(stream, width, height)
 
     return ReiaFile(width, height, frames_per_second, num_frames, frames)
@@ -1,9 +1,28 @@
 from . import _read_uint32_le
+from io import BytesIO
 import math
 from PIL import Image, ImageChops
 import typing
 
 
+class ReiaStreamError(ValueError):
+    """Raised when a stream of frames is truncated or corrupt.
+
+    Attributes
+    ------------
+
+    frame_index
+        Index of the frame that could not be read. This is also the number of
+        complete frames read before the error.
+    """
+
+    frame_index: int
+
+    def __init__(self, message: str, frame_index: int) -> None:
+        super().__init__(f"Frame {frame_index}: {message}")
+        self.frame_index = frame_index
+
+
 class ReiaFrame:
     """A single frame of video."""
 
@@ -15,8 +34,10 @@ class ReiaFrame:
 
 def read_single_pixel(stream: typing.BinaryIO) -> bytes:
     # We reverse here with `::-1` because the RGB value is stored as little endian.
-    pixel_value = stream.read(3)[::-1]
-    return pixel_value
+    pixel_value = stream.read(3)
+    if len(pixel_value) != 3:
+        raise ValueError("Unexpected end of data while reading pixel")
+    return pixel_value[::-1]
 
 
 def read_32_by_32_pixel_block(stream: typing.BinaryIO) -> Image:
@@ -27,9 +48,13 @@ def read_32_by_32_pixel_block(stream: typing.BinaryIO) -> Image:
     i = 0
     while i < num_pixels:
         rle_byte = stream.read(1)
-        assert rle_byte != b""
+        if rle_byte == b"":
+            raise ValueError("Unexpected end of data while reading RLE byte")
 
         rle_value = int.from_bytes(rle_byte, byteorder="big", signed=True)
+        # Either way the RLE byte covers at least |n| + 1 pixels.
+        if i + abs(rle_value) + 1 > num_pixels:
+            raise ValueError("RLE run goes past the end of the 32x32 block")
 
         if rle_value < 0:
             # Negative RLE value means we are going to be repeating the next
@@ -65,7 +90,10 @@ def read_single_frame(
             x, y = (j * 32), (i * 32)
             # First byte tells us if we should expect a new 32x32 pixel block
             # or re-use the one from the previous frame.
-            if stream.read(1) != b"\x00":
+            block_sent = stream.read(1)
+            if block_sent == b"":
+                raise ValueError("Unexpected end of data while reading block")
+            if block_sent != b"\x00":
                 block = read_32_by_32_pixel_block(stream)
                 if previous_frame is not None:
                     previous_block = previous_frame.image.crop((x, y, x + 32, y + 32))
@@ -115,6 +143,120 @@ def create_frame_reader(
         frame_magic = stream.read(4)
 
 
+def _read_exactly(stream: typing.BinaryIO, size: int) -> bytes:
+    """Reads `size` bytes, continuing after short reads (e.g. from pipes) and
+    only returning fewer bytes if the end of the stream is reached."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data.extend(chunk)
+    return bytes(data)
+
+
+def max_frame_size(width: int, height: int) -> int:
+    """The largest a valid encoded frame can be at a given resolution."""
+    num_blocks = int(math.ceil(width / 32)) * int(math.ceil(height / 32))
+    # Each block has its sent byte and, at worst, an RLE byte plus 3 bytes of
+    # color for every pixel.
+    return num_blocks * (1 + 32 * 32 * 4)
+
+
+def create_chunk_reader(
+    stream: typing.BinaryIO,
+    width: typing.Optional[int] = None,
+    height: typing.Optional[int] = None,
+) -> typing.Iterator[bytes]:
+    """Returns a generator over the raw, still encoded, data of each frame in
+    the stream without decoding any of them. Only one frame's data is held in
+    memory at a time.
+
+    Raises a ReiaStreamError if the stream ends partway through a frame. If the
+    resolution is given, frames claiming to be bigger than a valid frame could
+    be are rejected before their data is read.
+    """
+    size_limit = None
+    if width is not None and height is not None:
+        size_limit = max_frame_size(width, height)
+
+    frame_index = 0
+    frame_magic = _read_exactly(stream, 4)
+    while frame_magic != b"":
+        if frame_magic != b"frme":
+            raise ReiaStreamError(
+                f"Unexpected magic in start-of-frame, expected 'frme' got {frame_magic}",
+                frame_index,
+            )
+
+        frame_size_bytes = _read_exactly(stream, 4)
+        if len(frame_size_bytes) != 4:
+            raise ReiaStreamError("Frame header truncated", frame_index)
+        frame_size = int.from_bytes(frame_size_bytes, byteorder="little")
+        if size_limit is not None and frame_size > size_limit:
+            raise ReiaStreamError(
+                f"Frame size {frame_size} is bigger than the maximum of "
+                f"{size_limit} bytes for this resolution",
+                frame_index,
+            )
+
+        frame_data = _read_exactly(stream, frame_size)
+        if len(frame_data) != frame_size:
+            raise ReiaStreamError(
+                f"Frame data truncated, expected {frame_size} bytes got {len(frame_data)}",
+                frame_index,
+            )
+        yield frame_data
+        frame_index += 1
+
+        # Skip over the 2-byte alignment padding. It's fine for this to be
+        # missing on the last frame, the next read will just hit the end.
+        _read_exactly(stream, frame_size % 2)
+
+        frame_magic = _read_exactly(stream, 4)
+
+
+def decode_frame_chunk(
+    frame_data: bytes, width: int, height: int, previous_frame: ReiaFrame
+) -> ReiaFrame:
+    """Decodes the raw data of a single frame as returned by
+    create_chunk_reader."""
+    return read_single_frame(BytesIO(frame_data), width, height, previous_frame)
+
+
+def create_streaming_frame_reader(
+    stream: typing.BinaryIO, width: int, height: int
+) -> typing.Iterator[ReiaFrame]:
+    """Like create_frame_reader but meant for partial or still-arriving data,
+    such as a file being read from a pipe.
+
+    Each frame is buffered in full before being decoded, so frames are yielded
+    as soon as all their data has arrived. The frame size from each `frme`
+    header is checked against how much data decoding the frame used. If the
+    stream is truncated or corrupt, all the good frames before it are yielded
+    and then a ReiaStreamError is raised for the bad one.
+    """
+    previous_frame = None
+    for frame_index, frame_data in enumerate(
+        create_chunk_reader(stream, width, height)
+    ):
+        frame_stream = BytesIO(frame_data)
+        try:
+            frame = read_single_frame(frame_stream, width, height, previous_frame)
+        except ValueError as e:
+            raise ReiaStreamError(str(e), frame_index) from e
+
+        if frame_stream.tell() != len(frame_data):
+            raise ReiaStreamError(
+                f"Frame size is {len(frame_data)} bytes but decoding used "
+                f"{frame_stream.tell()}",
+                frame_index,
+            )
+
+        previous_frame = frame
+        yield frame
+
+
 def read_frames(
     stream: typing.BinaryIO, width: int, height: int
 ) -> typing.List[ReiaFrame]:
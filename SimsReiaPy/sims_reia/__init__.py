@@ -1,8 +1,12 @@
 def _read_uint32_le(stream) -> int:
     """Read a 32-bit little endian unsigned integer."""
-    return int.from_bytes(stream.read(4), byteorder="little", signed=False)
+    data = stream.read(4)
+    if len(data) != 4:
+        raise ValueError("Unexpected end of data while reading uint32")
+    return int.from_bytes(data, byteorder="little", signed=False)
 
 
 from .ReiaFile import ReiaFile, read_from_file
-from .ReiaFrame import ReiaFrame
+from .ReiaFrame import ReiaFrame, ReiaStreamError
 from .encoder import write_reia_file
+from .block_cache import BlockCache
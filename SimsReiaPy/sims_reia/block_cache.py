@@ -0,0 +1,118 @@
+from . import _read_uint32_le
+
+from collections import OrderedDict
+import hashlib
+from PIL import Image
+import typing
+
+
+class BlockCache:
+    """A bounded cache of encoded 32x32 blocks.
+
+    Blocks are looked up by a hash of the block and the block at the same
+    position in the previous frame, so the same pair of blocks coming up again
+    (e.g. in looping videos or when re-encoding the same clip) doesn't need to
+    be encoded again. A single cache can be shared between frames and files and
+    saved to disk with `save` to be re-used across runs.
+
+    When full, the most recently added block that has never been looked up is
+    evicted first, and only then the least recently used one. Re-encoding a clip
+    walks through the same blocks in the same order, so with plain LRU a clip
+    with more blocks than `max_entries` would evict every block before it comes
+    round again. This way the blocks that fit are kept and hit on the next run.
+
+    Attributes
+    ------------
+
+    max_entries
+        The maximum number of encoded blocks to hold before evicting some.
+
+    hits
+        Number of lookups that found an already encoded block.
+
+    misses
+        Number of lookups that had to encode the block.
+    """
+
+    max_entries: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Keys that were added but haven't been looked up since, in the order
+        # they were added.
+        self._unused = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(block: Image, previous_block: typing.Optional[Image]) -> bytes:
+        """Hash of a (block, previous block) pair used as the cache key."""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(block.tobytes())
+        # Distinguish between no previous block and an all-black one.
+        if previous_block is None:
+            hasher.update(b"\x00")
+        else:
+            hasher.update(b"\x01")
+            hasher.update(previous_block.tobytes())
+        return hasher.digest()
+
+    def get(self, key: bytes) -> typing.Optional[bytes]:
+        encoded = self._entries.get(key)
+        if encoded is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        self._unused.pop(key, None)
+        return encoded
+
+    def put(self, key: bytes, encoded: bytes):
+        if key not in self._entries:
+            while len(self._entries) >= self.max_entries:
+                self._evict()
+            self._unused[key] = None
+        self._entries[key] = bytes(encoded)
+        self._entries.move_to_end(key)
+
+    def _evict(self):
+        if len(self._unused) > 0:
+            key, _ = self._unused.popitem(last=True)
+            del self._entries[key]
+        else:
+            self._entries.popitem(last=False)
+
+    def save(self, stream: typing.BinaryIO):
+        """Writes out the cached blocks, least recently used first."""
+        stream.write(b"RBLC")
+        stream.write(len(self._entries).to_bytes(4, byteorder="little"))
+        for key, encoded in self._entries.items():
+            stream.write(key)
+            stream.write(len(encoded).to_bytes(4, byteorder="little"))
+            stream.write(encoded)
+
+    @classmethod
+    def load(cls, stream: typing.BinaryIO, max_entries: int = 4096) -> "BlockCache":
+        """Reads back a cache written with `save`."""
+        magic = stream.read(4)
+        if magic != b"RBLC":
+            raise ValueError(
+                f"Incorrect block cache magic, expected 'RBLC' got {magic}"
+            )
+
+        cache = cls(max_entries)
+        num_entries = _read_uint32_le(stream)
+        for _ in range(num_entries):
+            key = stream.read(16)
+            encoded_size = _read_uint32_le(stream)
+            encoded = stream.read(encoded_size)
+            if len(key) != 16 or len(encoded) != encoded_size:
+                raise ValueError("Block cache data truncated")
+            cache.put(key, encoded)
+        return cache
@@ -0,0 +1,320 @@
+"""Edits existing .reia files while re-encoding as few frames as possible.
+
+Frames are stored as the difference to the previous frame, so a frame only has
+to be re-encoded when its own content or the frame before it changes. Every
+other frame's data is copied over as-is.
+"""
+from .ReiaFile import read_header
+from .ReiaFrame import ReiaFrame, create_chunk_reader, decode_frame_chunk
+from .encoder import (
+    write_reia_header,
+    write_reia_frame,
+    write_frame_chunk,
+    write_riff_size,
+    write_num_frames,
+)
+
+from PIL import Image
+import typing
+
+
+def replace_frames(
+    input_stream: typing.BinaryIO,
+    output_stream: typing.BinaryIO,
+    start: int,
+    end: int,
+    frames: typing.Iterable[ReiaFrame],
+):
+    """Writes a copy of the .reia file in `input_stream` to `output_stream`
+    with the frames in the index range `[start, end)` replaced by `frames`.
+
+    The number of replacement frames does not need to match the size of the
+    range. Only the replacement frames and the frame right after the range are
+    encoded, all other frames are copied without re-encoding them.
+    """
+    assert output_stream.seekable()
+
+    width, height, fps_numerator, fps_denominator, num_frames = read_header(
+        input_stream
+    )
+    if not 0 <= start <= end <= num_frames:
+        raise ValueError(
+            f"Invalid frame range [{start}, {end}) for file with {num_frames} frames"
+        )
+
+    # The number of frames gets fixed up once we know how many were written.
+    write_reia_header(output_stream, width, height, fps_numerator, fps_denominator, 0)
+
+    frames_written = 0
+    replaced = False
+    # The last frame written to the output, which the next frame we encode will
+    # be encoded against.
+    previous_image = None
+    # The last frame decoded from the input, needed to decode the next one.
+    previous_original_frame = None
+
+    def write_replacements():
+        nonlocal frames_written, previous_image, replaced
+        replaced = True
+        for frame in frames:
+            if frame.image.size != (width, height):
+                raise ValueError(
+                    f"Replacement frame is {frame.image.size[0]}x{frame.image.size[1]}"
+                    f", expected {width}x{height}"
+                )
+            if frame.image.mode != "RGB":
+                raise ValueError(
+                    f"Replacement frame has mode {frame.image.mode}, expected RGB"
+                )
+            write_frame_chunk(
+                output_stream, write_reia_frame(frame.image, previous_image)
+            )
+            frames_written += 1
+            previous_image = frame.image
+
+    for index, frame_data in enumerate(
+        create_chunk_reader(input_stream, width, height)
+    ):
+        if index == start:
+            write_replacements()
+
+        if index > end:
+            # Past the edit, these frames can be copied as-is.
+            write_frame_chunk(output_stream, frame_data)
+            frames_written += 1
+            continue
+
+        # We need to keep decoding up to the frame after the range, since it
+        # gets re-encoded against the last replacement frame.
+        previous_original_frame = decode_frame_chunk(
+            frame_data, width, height, previous_original_frame
+        )
+        if index < start:
+            write_frame_chunk(output_stream, frame_data)
+            frames_written += 1
+            previous_image = previous_original_frame.image
+        elif index == end:
+            encoded_frame = write_reia_frame(
+                previous_original_frame.image, previous_image
+            )
+            write_frame_chunk(output_stream, encoded_frame)
+            frames_written += 1
+
+    # Replacing at the very end of the file appends the frames.
+    if not replaced:
+        write_replacements()
+
+    write_num_frames(output_stream, frames_written)
+    write_riff_size(output_stream)
+
+
+def _read_headers(input_streams: typing.List[typing.BinaryIO]):
+    """Reads the headers of all the inputs, making sure they have the same
+    resolution and fps so they can be spliced together. Returns the header of
+    the first input."""
+    headers = [read_header(input_stream) for input_stream in input_streams]
+
+    width, height, fps_numerator, fps_denominator, _ = headers[0]
+    for i, header in enumerate(headers):
+        other_width, other_height, other_numerator, other_denominator, _ = header
+        if (other_width, other_height) != (width, height):
+            raise ValueError(
+                f"Input {i} is {other_width}x{other_height}, expected {width}x{height}"
+            )
+        if other_numerator * fps_denominator != fps_numerator * other_denominator:
+            raise ValueError(
+                f"Input {i} has fps {other_numerator}/{other_denominator}, "
+                f"expected {fps_numerator}/{fps_denominator}"
+            )
+
+    return headers[0]
+
+
+def _decode_segment(
+    input_stream: typing.BinaryIO,
+    width: int,
+    height: int,
+    start: int,
+    end: typing.Optional[int],
+    needs_last_image: bool,
+):
+    """Decodes the frames `[start, end)` of a stream positioned at its first
+    frame. Returns a tuple of `(first_frame_data, first_image, last_image)`, or
+    None if the range is empty. Only one frame is held in memory at a time.
+
+    All the frames up to the start of the range need to be decoded to get its
+    first frame. If `needs_last_image` is set decoding carries on to the end of
+    the range, for the next segment to be encoded against; otherwise
+    `last_image` is None.
+    """
+    previous_frame = None
+    first_frame_data, first_image = None, None
+    for index, frame_data in enumerate(
+        create_chunk_reader(input_stream, width, height)
+    ):
+        if end is not None and index >= end:
+            break
+        if index > start and not needs_last_image:
+            break
+        previous_frame = decode_frame_chunk(frame_data, width, height, previous_frame)
+        if index == start:
+            first_frame_data, first_image = frame_data, previous_frame.image
+
+    if first_image is None:
+        return None
+    last_image = previous_frame.image if needs_last_image else None
+    return (first_frame_data, first_image, last_image)
+
+
+def _copy_chunks(
+    input_stream: typing.BinaryIO,
+    output_stream: typing.BinaryIO,
+    width: int,
+    height: int,
+    start: int,
+    end: typing.Optional[int],
+) -> int:
+    """Copies the frames `[start, end)` of a stream positioned at its first
+    frame to the output as-is. Returns how many frames were copied."""
+    frames_copied = 0
+    for index, frame_data in enumerate(
+        create_chunk_reader(input_stream, width, height)
+    ):
+        if end is not None and index >= end:
+            break
+        if index >= start:
+            write_frame_chunk(output_stream, frame_data)
+            frames_copied += 1
+    return frames_copied
+
+
+def _write_segment(
+    output_stream: typing.BinaryIO,
+    input_stream: typing.BinaryIO,
+    header,
+    start: int,
+    end: typing.Optional[int],
+    previous_image: typing.Optional[Image],
+    needs_last_image: bool,
+):
+    """Writes the frames `[start, end)` of a stream positioned at its first
+    frame after `previous_image`. Only the first frame of the segment is
+    re-encoded, the rest are copied as-is. Returns a tuple of
+    `(frames_written, last_image)`.
+    """
+    width, height = header[0], header[1]
+    frames_position = input_stream.tell()
+    segment = _decode_segment(input_stream, width, height, start, end, needs_last_image)
+    if segment is None:
+        return (0, previous_image)
+    first_frame_data, first_image, last_image = segment
+
+    if previous_image is None and start == 0:
+        # The very first frame of a file isn't encoded against anything so it
+        # can be kept as it was.
+        write_frame_chunk(output_stream, first_frame_data)
+    else:
+        write_frame_chunk(output_stream, write_reia_frame(first_image, previous_image))
+
+    # Go back over the stream to copy over the rest of the frames.
+    input_stream.seek(frames_position)
+    frames_written = 1 + _copy_chunks(
+        input_stream, output_stream, width, height, start + 1, end
+    )
+    return (frames_written, last_image)
+
+
+def _start_output(output_stream: typing.BinaryIO, header):
+    assert output_stream.seekable()
+    width, height, fps_numerator, fps_denominator, _ = header
+    # The number of frames gets fixed up once we know how many were written.
+    write_reia_header(output_stream, width, height, fps_numerator, fps_denominator, 0)
+
+
+def _finish_output(output_stream: typing.BinaryIO, frames_written: int):
+    write_num_frames(output_stream, frames_written)
+    write_riff_size(output_stream)
+
+
+def trim(
+    input_stream: typing.BinaryIO,
+    output_stream: typing.BinaryIO,
+    start: int,
+    end: int,
+):
+    """Writes the frames in the index range `[start, end)` of the input to
+    `output_stream` as a new .reia file. The input must be seekable."""
+    header = _read_headers([input_stream])
+    num_frames = header[4]
+    if not 0 <= start <= end <= num_frames:
+        raise ValueError(
+            f"Invalid frame range [{start}, {end}) for file with {num_frames} frames"
+        )
+
+    _start_output(output_stream, header)
+    frames_written, _ = _write_segment(
+        output_stream, input_stream, header, start, end, None, False
+    )
+    _finish_output(output_stream, frames_written)
+
+
+def concat(input_streams: typing.List[typing.BinaryIO], output_stream: typing.BinaryIO):
+    """Writes all the frames of each of the inputs one after the other to
+    `output_stream`. All the inputs must be seekable and have the same
+    resolution and fps. The inputs are processed one at a time."""
+    if len(input_streams) == 0:
+        raise ValueError("Need at least one input to concatenate")
+    header = _read_headers(input_streams)
+
+    _start_output(output_stream, header)
+    frames_written = 0
+    previous_image = None
+    for i, input_stream in enumerate(input_streams):
+        # The last frame is only needed if another input gets encoded against it.
+        needs_last_image = i != len(input_streams) - 1
+        segment_frames, previous_image = _write_segment(
+            output_stream,
+            input_stream,
+            header,
+            0,
+            None,
+            previous_image,
+            needs_last_image,
+        )
+        frames_written += segment_frames
+    _finish_output(output_stream, frames_written)
+
+
+def loop(input_stream: typing.BinaryIO, output_stream: typing.BinaryIO, count: int):
+    """Writes the frames of the input `count` times over to `output_stream`.
+    The input must be seekable."""
+    if count < 1:
+        raise ValueError(f"Loop count must be at least 1, got {count}")
+    header = _read_headers([input_stream])
+    frames_position = input_stream.tell()
+
+    _start_output(output_stream, header)
+    segment = _decode_segment(
+        input_stream, header[0], header[1], 0, None, needs_last_image=count > 1
+    )
+    if segment is None:
+        _finish_output(output_stream, 0)
+        return
+    first_frame_data, first_image, last_image = segment
+
+    # Every repeat after the first starts with the first frame encoded against
+    # the last one, which is the same every time so only encode it once.
+    wrap_around_frame = None
+    if count > 1:
+        wrap_around_frame = write_reia_frame(first_image, last_image)
+
+    frames_written = 0
+    for i in range(count):
+        write_frame_chunk(
+            output_stream, first_frame_data if i == 0 else wrap_around_frame
+        )
+        input_stream.seek(frames_position)
+        frames_written += 1 + _copy_chunks(
+            input_stream, output_stream, header[0], header[1], 1, None
+        )
+    _finish_output(output_stream, frames_written)
@@ -1,5 +1,6 @@
 from .ReiaFile import ReiaFile
 from .ReiaFrame import ReiaFrame
+from .block_cache import BlockCache
 
 from PIL import Image, ImageChops
 
@@ -12,9 +13,16 @@ def pack_uint32_le(value: int) -> bytes:
     return value.to_bytes(4, byteorder="little", signed=False)
 
 
-def write_reia_file(file: ReiaFile, output_stream: typing.BinaryIO):
-    assert output_stream.seekable()
-
+def write_reia_header(
+    output_stream: typing.BinaryIO,
+    width: int,
+    height: int,
+    fps_numerator: int,
+    fps_denominator: int,
+    num_frames: int,
+):
+    """Writes the RIFF and Reiahead headers. The RIFF size is written as a
+    placeholder, call `write_riff_size` once all the frames are written."""
     # Write the magic for the RIFF container header.
     output_stream.write(b"RIFF")
 
@@ -36,9 +44,41 @@ def write_reia_file(file: ReiaFile, output_stream: typing.BinaryIO):
     # Unknown field.
     output_stream.write(pack_uint32_le(1))
     # Video width.
-    output_stream.write(pack_uint32_le(file.width))
+    output_stream.write(pack_uint32_le(width))
     # Video height.
-    output_stream.write(pack_uint32_le(file.height))
+    output_stream.write(pack_uint32_le(height))
+    # Frames per second data.
+    output_stream.write(pack_uint32_le(fps_numerator))
+    output_stream.write(pack_uint32_le(fps_denominator))
+    # Number of frames.
+    output_stream.write(pack_uint32_le(num_frames))
+
+
+def write_riff_size(output_stream: typing.BinaryIO):
+    """Seeks back to the start of the file and writes the RIFF container size
+    based on the current position, then returns to the current position."""
+    file_size = output_stream.tell()
+    output_stream.seek(4)
+    # Size of what we wrote minus the magic and the size field itself.
+    output_stream.write(pack_uint32_le(file_size - 8))
+    output_stream.seek(file_size)
+
+
+def write_num_frames(output_stream: typing.BinaryIO, num_frames: int):
+    """Overwrites the number of frames field in the header, then returns to the
+    current position."""
+    position = output_stream.tell()
+    output_stream.seek(0x28)
+    output_stream.write(pack_uint32_le(num_frames))
+    output_stream.seek(position)
+
+
+def write_reia_file(
+    file: ReiaFile,
+    output_stream: typing.BinaryIO,
+    cache: typing.Optional[BlockCache] = None,
+):
+    assert output_stream.seekable()
 
     # Calculate the fps numerator and denominator.
     #
@@ -48,35 +88,42 @@ def write_reia_file(file: ReiaFile, output_stream: typing.BinaryIO):
     if file.frames_per_second == 10:
         fps_numerator = 10
     fps_denominator = int(fps_numerator // file.frames_per_second)
-    # Frames per second data.
-    output_stream.write(pack_uint32_le(fps_numerator))
-    output_stream.write(pack_uint32_le(fps_denominator))
-    # Number of frames.
-    output_stream.write(pack_uint32_le(file.num_frames))
+
+    write_reia_header(
+        output_stream,
+        file.width,
+        file.height,
+        fps_numerator,
+        fps_denominator,
+        file.num_frames,
+    )
 
     # Write out the frames.
-    write_reia_frames(file.frames, output_stream)
+    write_reia_frames(file.frames, output_stream, cache)
 
-    # Seek back to the start of the file and write the RIFF container size
-    # properly.
-    file_size = output_stream.tell()
-    output_stream.seek(4)
-    # Size of what we wrote minus the magic and the size field itself.
-    output_stream.write(pack_uint32_le(file_size - 8))
+    # Go back and write the RIFF container size properly.
+    write_riff_size(output_stream)
+
+
+def write_frame_chunk(output_stream: typing.BinaryIO, encoded_frame: bytes):
+    """Writes out the data of a single encoded frame with its `frme` header."""
+    output_stream.write(b"frme")
+    output_stream.write(pack_uint32_le(len(encoded_frame)))
+    output_stream.write(encoded_frame)
+    # Add padding to align frames to nearest 2-byte boundary if needed.
+    if len(encoded_frame) % 2 != 0:
+        output_stream.write(b"\x00")
 
 
 def write_reia_frames(
-    frames: typing.Iterator[ReiaFrame], output_stream: typing.BinaryIO
+    frames: typing.Iterator[ReiaFrame],
+    output_stream: typing.BinaryIO,
+    cache: typing.Optional[BlockCache] = None,
 ):
     previous_frame_image = None
     for frame in frames:
-        encoded_frame = write_reia_frame(frame.image, previous_frame_image)
-        output_stream.write(b"frme")
-        output_stream.write(pack_uint32_le(len(encoded_frame)))
-        output_stream.write(encoded_frame)
-        # Add padding to align frames to nearest 2-byte boundary if needed.
-        if len(encoded_frame) % 2 != 0:
-            output_stream.write(b"\x00")
+        encoded_frame = write_reia_frame(frame.image, previous_frame_image, cache)
+        write_frame_chunk(output_stream, encoded_frame)
 
         # Make sure they're all the same resolution!
         if previous_frame_image is not None:
@@ -84,7 +131,9 @@ def write_reia_frames(
         previous_frame_image = frame.image
 
 
-def write_reia_frame(frame, previous_frame) -> bytes:
+def write_reia_frame(
+    frame, previous_frame, cache: typing.Optional[BlockCache] = None
+) -> bytes:
     output = bytearray()
 
     width, height = frame.size[0], frame.size[1]
@@ -103,7 +152,14 @@ def write_reia_frame(frame, previous_frame) -> bytes:
             if previous_frame:
                 previous_block = crop_32_by_32_block(previous_frame, x, y)
 
-            block = write_reia_block(current_block, previous_block)
+            if cache is None:
+                block = write_reia_block(current_block, previous_block)
+            else:
+                key = cache.key(current_block, previous_block)
+                block = cache.get(key)
+                if block is None:
+                    block = write_reia_block(current_block, previous_block)
+                    cache.put(key, block)
             output.extend(block)
 
     return output
@@ -115,7 +171,6 @@ def crop_32_by_32_block(frame: Image, x: int, y: int):
     if cropped.size[0] == 32 and cropped.size[1] == 32:
         return cropped
     # Pad to 32-32
-    print("Padding because block is ", cropped.size)
     result = Image.new(cropped.mode, (32, 32))
     result.paste(cropped, (0, 0))
     return result
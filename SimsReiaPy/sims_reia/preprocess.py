@@ -0,0 +1,94 @@
+"""Optional color reduction stages that can be run on frames before encoding.
+Fewer colors means longer runs of identical pixels for the run-length encoding,
+giving smaller files that encode and decode faster."""
+from .ReiaFrame import ReiaFrame
+
+from PIL import Image, ImageOps
+
+import typing
+
+
+def check_posterize_bits(bits: int):
+    """Raises a ValueError if `bits` isn't a valid number of bits to keep."""
+    if not 1 <= bits <= 8:
+        raise ValueError(f"Posterize bits must be between 1 and 8, got {bits}")
+
+
+def check_num_colors(num_colors: int):
+    """Raises a ValueError if `num_colors` isn't a valid palette size."""
+    if not 2 <= num_colors <= 256:
+        raise ValueError(
+            f"Number of palette colors must be between 2 and 256, got {num_colors}"
+        )
+
+
+def posterize_frames(
+    frames: typing.Iterable[ReiaFrame], bits: int
+) -> typing.Iterator[ReiaFrame]:
+    """Returns a generator that keeps only the top `bits` bits of each color
+    channel of every frame. The same input color always maps to the same output
+    color so this is stable from frame to frame."""
+    # Check the arguments now rather than when the generator is first used.
+    check_posterize_bits(bits)
+    return (ReiaFrame(ImageOps.posterize(frame.image, bits)) for frame in frames)
+
+
+def create_palette(images: typing.Sequence[Image], num_colors: int) -> Image:
+    """Creates a palette image with at most `num_colors` colors picked to best
+    represent all of the given images together. Pass in frames sampled from
+    across the whole video so that e.g. a fade in from black doesn't end up
+    with a palette of just black."""
+    check_num_colors(num_colors)
+    if len(images) == 0:
+        raise ValueError("Need at least one image to create a palette from")
+
+    # Stack the images on top of each other and quantize them all at once.
+    width = max(image.size[0] for image in images)
+    height = sum(image.size[1] for image in images)
+    montage = Image.new("RGB", (width, height))
+    y = 0
+    for image in images:
+        montage.paste(image.convert("RGB"), (0, y))
+        y += image.size[1]
+    return montage.quantize(colors=num_colors, dither=Image.Dither.NONE)
+
+
+def sample_evenly(items: typing.Sequence, max_samples: int) -> typing.List:
+    """Picks up to `max_samples` items spread evenly across `items`."""
+    if len(items) <= max_samples:
+        return list(items)
+    return [items[i * len(items) // max_samples] for i in range(max_samples)]
+
+
+def palette_frames(
+    frames: typing.Iterable[ReiaFrame],
+    num_colors: int,
+    palette: typing.Optional[Image] = None,
+    max_samples: int = 16,
+) -> typing.Iterator[ReiaFrame]:
+    """Returns a generator that maps every frame onto a single shared palette.
+    Dithering is turned off so that the same color is mapped to the same palette
+    entry in every frame.
+
+    If `palette` is not given, one with `num_colors` colors is built from up to
+    `max_samples` frames spread across the video. Note that this means all the
+    frames are held in memory, pass a palette from `create_palette` to avoid
+    that.
+    """
+    # Check the arguments now rather than when the generator is first used.
+    check_num_colors(num_colors)
+    if palette is None:
+        frames = list(frames)
+        if len(frames) == 0:
+            return iter([])
+        samples = sample_evenly(frames, max_samples)
+        palette = create_palette([frame.image for frame in samples], num_colors)
+
+    return (
+        ReiaFrame(
+            frame.image.quantize(palette=palette, dither=Image.Dither.NONE).convert(
+                "RGB"
+            )
+        )
+        for frame in frames
+    )
@@ -1,4 +1,5 @@
 import sims_reia
+from .ReiaFrame_test import ShortReadStream
 
 import pytest
 from io import BytesIO
@@ -50,3 +51,30 @@ def test_metadata_is_correct_on_known_file():
     assert reia_file.width == 128
     assert reia_file.height == 128
     assert reia_file.num_frames == 0
+
+
+KNOWN_HEADER = (
+    b"RIFF"
+    + b"\xf2\xac]\x00"
+    + b"Reiahead\x18\x00\x00\x00\x01\x00\x00\x00\x80\x00\x00\x00\x80\x00\x00\x00"
+    + b"\n\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00"
+)
+
+
+def test_streaming_reads_header_with_short_reads():
+    reia_file = sims_reia.read_from_file(
+        ShortReadStream(KNOWN_HEADER, chunk_size=3), streaming=True
+    )
+
+    assert reia_file.width == 128
+    assert reia_file.height == 128
+    assert reia_file.frames_per_second == 10.0
+    assert list(reia_file.frames) == []
+
+
+def test_streaming_throws_stream_error_on_truncated_header():
+    with pytest.raises(sims_reia.ReiaStreamError) as excinfo:
+        sims_reia.read_from_file(BytesIO(KNOWN_HEADER[:30]), streaming=True)
+
+    assert excinfo.value.frame_index == 0
+    assert "Header truncated" in str(excinfo.value)
@@ -1,4 +1,8 @@
-from sims_reia.ReiaFrame import read_frames
+from sims_reia.ReiaFrame import (
+    ReiaStreamError,
+    create_streaming_frame_reader,
+    read_frames,
+)
 
 import pytest
 from pathlib import Path
@@ -36,3 +40,94 @@ def test_parses_two_frames_correctly():
 
     assert_images_are_same(frames[0].image, real_frame_one)
     assert_images_are_same(frames[1].image, real_frame_two)
+
+
+def test_streaming_reader_parses_two_frames_correctly():
+    real_frame_one = Image.open(TEST_DATA_DIRECTORY / "frame1.png").convert("RGB")
+    real_frame_two = Image.open(TEST_DATA_DIRECTORY / "frame2.png").convert("RGB")
+
+    frame_file = TEST_DATA_DIRECTORY / "first_two_frames.bin"
+    with frame_file.open("rb") as f:
+        frames = list(create_streaming_frame_reader(f, width=128, height=128))
+
+    assert len(frames) == 2
+    assert_images_are_same(frames[0].image, real_frame_one)
+    assert_images_are_same(frames[1].image, real_frame_two)
+
+
+class ShortReadStream:
+    """Stream that returns at most `chunk_size` bytes per read, like a pipe."""
+
+    def __init__(self, data: bytes, chunk_size: int) -> None:
+        self._stream = BytesIO(data)
+        self._chunk_size = chunk_size
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            size = self._chunk_size
+        return self._stream.read(min(size, self._chunk_size))
+
+
+def test_streaming_reader_handles_short_reads():
+    data = (TEST_DATA_DIRECTORY / "first_two_frames.bin").read_bytes()
+
+    frames = list(
+        create_streaming_frame_reader(
+            ShortReadStream(data, chunk_size=5), width=128, height=128
+        )
+    )
+
+    assert len(frames) == 2
+
+
+def test_streaming_reader_stops_at_last_good_frame_when_truncated():
+    data = (TEST_DATA_DIRECTORY / "first_two_frames.bin").read_bytes()
+    real_frame_one = Image.open(TEST_DATA_DIRECTORY / "frame1.png").convert("RGB")
+
+    frames = []
+    with pytest.raises(ReiaStreamError) as excinfo:
+        for frame in create_streaming_frame_reader(
+            BytesIO(data[:-100]), width=128, height=128
+        ):
+            frames.append(frame)
+
+    assert excinfo.value.frame_index == 1
+    assert "Frame data truncated" in str(excinfo.value)
+    assert len(frames) == 1
+    assert_images_are_same(frames[0].image, real_frame_one)
+
+
+def test_streaming_reader_checks_frame_size():
+    data = (TEST_DATA_DIRECTORY / "first_two_frames.bin").read_bytes()
+    frame_size = int.from_bytes(data[4:8], byteorder="little")
+    # Claim the first frame is bigger than it really is.
+    bad_size = (frame_size + 2).to_bytes(4, byteorder="little")
+    data = data[:4] + bad_size + data[8 : 8 + frame_size] + b"\x00\x00"
+
+    with pytest.raises(ReiaStreamError) as excinfo:
+        list(create_streaming_frame_reader(BytesIO(data), width=128, height=128))
+
+    assert excinfo.value.frame_index == 0
+    assert "decoding used" in str(excinfo.value)
+
+
+def test_reader_throws_on_truncated_block():
+    data = (TEST_DATA_DIRECTORY / "first_two_frames.bin").read_bytes()
+
+    with pytest.raises(ValueError) as excinfo:
+        read_frames(BytesIO(data[:100]), width=128, height=128)
+
+    assert "Unexpected end of data" in str(excinfo.value)
+
+
+def test_streaming_reader_rejects_oversized_frame_before_reading_it():
+    data = b"frme" + (0xFFFFFF00).to_bytes(4, byteorder="little") + b"\x00" * 64
+    stream = BytesIO(data)
+
+    with pytest.raises(ReiaStreamError) as excinfo:
+        list(create_streaming_frame_reader(stream, width=128, height=128))
+
+    assert excinfo.value.frame_index == 0
+    assert "bigger than the maximum" in str(excinfo.value)
+    # Nothing past the frame header was read.
+    assert stream.tell() == 8
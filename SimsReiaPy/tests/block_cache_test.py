@@ -0,0 +1,111 @@
+from sims_reia import BlockCache, ReiaFile, ReiaFrame, write_reia_file
+from sims_reia import encoder
+
+import pytest
+from io import BytesIO
+
+from PIL import Image
+
+
+def _make_block(color):
+    return Image.new("RGB", (32, 32), color=color)
+
+
+def test_key_differs_between_no_previous_block_and_black_block():
+    block = _make_block((1, 2, 3))
+
+    assert BlockCache.key(block, None) != BlockCache.key(block, _make_block(0))
+
+
+def test_counts_hits_and_misses():
+    cache = BlockCache()
+    key = BlockCache.key(_make_block((1, 2, 3)), None)
+
+    assert cache.get(key) is None
+    cache.put(key, b"\x01abc")
+    assert cache.get(key) == b"\x01abc"
+
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_evicts_least_recently_used():
+    cache = BlockCache(max_entries=2)
+    cache.put(b"a" * 16, b"1")
+    cache.put(b"b" * 16, b"2")
+    # Touch the first entry so the second one gets evicted.
+    cache.get(b"a" * 16)
+    cache.put(b"c" * 16, b"3")
+
+    assert len(cache) == 2
+    assert cache.get(b"a" * 16) == b"1"
+    assert cache.get(b"b" * 16) is None
+
+
+def test_encoding_with_cache_gives_same_output():
+    frames = [
+        Image.new("RGB", (64, 64), color=(255, 0, 0)),
+        Image.new("RGB", (64, 64), color=(0, 0, 255)),
+    ]
+    # Loop the two frames so the same block pairs come up again.
+    frames = frames * 3
+
+    def encode(cache):
+        output = BytesIO()
+        reia_file = ReiaFile(64, 64, 10, len(frames), iter(map(ReiaFrame, frames)))
+        write_reia_file(reia_file, output, cache)
+        return output.getvalue()
+
+    cache = BlockCache()
+    assert encode(cache) == encode(None)
+    assert cache.hits > 0
+
+
+def test_round_trips_through_save_and_load():
+    cache = BlockCache()
+    key = BlockCache.key(_make_block((1, 2, 3)), _make_block((4, 5, 6)))
+    cache.put(key, encoder.write_reia_block(_make_block((1, 2, 3)), None))
+
+    saved = BytesIO()
+    cache.save(saved)
+    saved.seek(0)
+    loaded = BlockCache.load(saved)
+
+    assert len(loaded) == 1
+    assert loaded.get(key) == cache.get(key)
+
+
+def test_load_throws_on_truncated_data():
+    cache = BlockCache()
+    cache.put(b"a" * 16, b"encoded")
+    saved = BytesIO()
+    cache.save(saved)
+
+    with pytest.raises(ValueError) as excinfo:
+        BlockCache.load(BytesIO(saved.getvalue()[:-2]))
+
+    assert "Block cache data truncated" in str(excinfo.value)
+
+
+def test_re_encoding_clip_bigger_than_cache_still_hits():
+    # Every block of every frame is different, giving 4 new block pairs per
+    # frame.
+    frames = []
+    for i in range(20):
+        frame = Image.new("RGB", (64, 64))
+        for j, (x, y) in enumerate([(0, 0), (32, 0), (0, 32), (32, 32)]):
+            frame.paste((i, j, 0), (x, y, x + 32, y + 32))
+        frames.append(frame)
+
+    def encode(cache):
+        reia_file = ReiaFile(64, 64, 10, len(frames), iter(map(ReiaFrame, frames)))
+        write_reia_file(reia_file, BytesIO(), cache)
+
+    cache = BlockCache(max_entries=40)
+    encode(cache)
+    assert cache.hits == 0
+
+    cache.hits, cache.misses = 0, 0
+    encode(cache)
+    # Half of the 80 block pairs fit in the cache.
+    assert cache.hits >= 36
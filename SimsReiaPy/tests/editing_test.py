@@ -0,0 +1,212 @@
+from sims_reia import ReiaFile, ReiaFrame, write_reia_file, read_from_file
+from sims_reia import editing
+from sims_reia.ReiaFile import read_header
+from sims_reia.ReiaFrame import create_chunk_reader
+from .ReiaFrame_test import assert_images_are_same
+
+import pytest
+from io import BytesIO
+
+from PIL import Image
+
+
+def _make_frames(count: int, offset: int = 0):
+    """Frames with a moving white bar so that each one differs from the last."""
+    frames = []
+    for i in range(count):
+        image = Image.new("RGB", (64, 64), color=(offset, 0, 0))
+        image.paste((255, 255, 255), ((i * 7) % 64, 0, (i * 7) % 64 + 5, 64))
+        frames.append(image)
+    return frames
+
+
+def _encode(images) -> BytesIO:
+    output = BytesIO()
+    write_reia_file(
+        ReiaFile(
+            width=64,
+            height=64,
+            frames_per_second=10,
+            num_frames=len(images),
+            frames=iter([ReiaFrame(image) for image in images]),
+        ),
+        output,
+    )
+    output.seek(0)
+    return output
+
+
+def _chunks(stream: BytesIO):
+    stream.seek(0)
+    read_header(stream)
+    return list(create_chunk_reader(stream))
+
+
+def test_replace_frames_in_middle_of_file():
+    originals = _make_frames(6)
+    replacements = _make_frames(3, offset=100)
+    input = _encode(originals)
+
+    output = BytesIO()
+    editing.replace_frames(input, output, 2, 4, [ReiaFrame(i) for i in replacements])
+
+    expected = originals[:2] + replacements + originals[4:]
+    output.seek(0)
+    edited_file = read_from_file(output)
+    assert edited_file.num_frames == len(expected)
+    for frame, expected_image in zip(edited_file.frames, expected):
+        assert_images_are_same(frame.image, expected_image)
+
+    # Frames before the range and more than one frame after it are copied.
+    original_chunks, edited_chunks = _chunks(input), _chunks(output)
+    assert edited_chunks[:2] == original_chunks[:2]
+    assert edited_chunks[6:] == original_chunks[5:]
+
+    # RIFF size covers the whole file.
+    assert read_header(BytesIO(output.getvalue()))[4] == 7
+    assert (
+        int.from_bytes(output.getvalue()[4:8], "little") == len(output.getvalue()) - 8
+    )
+
+
+def test_replace_frames_at_start_and_end():
+    originals = _make_frames(3)
+    replacement = _make_frames(1, offset=50)[0]
+
+    output = BytesIO()
+    editing.replace_frames(_encode(originals), output, 0, 1, [ReiaFrame(replacement)])
+    output.seek(0)
+    frames = list(read_from_file(output).frames)
+    assert_images_are_same(frames[0].image, replacement)
+    assert_images_are_same(frames[1].image, originals[1])
+
+    appended = BytesIO()
+    editing.replace_frames(_encode(originals), appended, 3, 3, [ReiaFrame(replacement)])
+    appended.seek(0)
+    frames = list(read_from_file(appended).frames)
+    assert len(frames) == 4
+    assert_images_are_same(frames[3].image, replacement)
+
+
+def test_replace_frames_throws_on_invalid_range():
+    with pytest.raises(ValueError) as excinfo:
+        editing.replace_frames(_encode(_make_frames(2)), BytesIO(), 1, 3, [])
+
+    assert "Invalid frame range" in str(excinfo.value)
+
+
+def test_replace_frames_throws_on_wrong_resolution():
+    wrong_size = Image.new("RGB", (32, 32))
+
+    with pytest.raises(ValueError) as excinfo:
+        editing.replace_frames(
+            _encode(_make_frames(2)), BytesIO(), 0, 1, [ReiaFrame(wrong_size)]
+        )
+
+    assert "expected 64x64" in str(excinfo.value)
+
+
+def _decoded(stream: BytesIO):
+    stream.seek(0)
+    reia_file = read_from_file(stream)
+    return reia_file, [frame.image for frame in reia_file.frames]
+
+
+def test_trim_keeps_range_of_frames():
+    originals = _make_frames(6)
+    input = _encode(originals)
+
+    output = BytesIO()
+    editing.trim(input, output, 2, 5)
+
+    reia_file, images = _decoded(output)
+    assert reia_file.num_frames == 3
+    assert len(images) == 3
+    for image, expected in zip(images, originals[2:5]):
+        assert_images_are_same(image, expected)
+    # Only the first frame is re-encoded.
+    assert _chunks(output)[1:] == _chunks(input)[3:5]
+
+
+def test_concat_splices_files_together():
+    first, second = _make_frames(3), _make_frames(4, offset=80)
+    first_input, second_input = _encode(first), _encode(second)
+
+    output = BytesIO()
+    editing.concat([first_input, second_input], output)
+
+    reia_file, images = _decoded(output)
+    assert reia_file.num_frames == 7
+    for image, expected in zip(images, first + second):
+        assert_images_are_same(image, expected)
+    assert _chunks(output)[:3] == _chunks(first_input)
+    assert _chunks(output)[4:] == _chunks(second_input)[1:]
+
+
+def test_concat_throws_on_mismatched_resolution():
+    other = BytesIO()
+    write_reia_file(
+        ReiaFile(32, 32, 10, 1, iter([ReiaFrame(Image.new("RGB", (32, 32)))])),
+        other,
+    )
+    other.seek(0)
+
+    with pytest.raises(ValueError) as excinfo:
+        editing.concat([_encode(_make_frames(1)), other], BytesIO())
+
+    assert "Input 1 is 32x32, expected 64x64" in str(excinfo.value)
+
+
+def test_concat_throws_on_mismatched_fps():
+    other = BytesIO()
+    write_reia_file(
+        ReiaFile(64, 64, 24, 1, iter([ReiaFrame(Image.new("RGB", (64, 64)))])),
+        other,
+    )
+    other.seek(0)
+
+    with pytest.raises(ValueError) as excinfo:
+        editing.concat([_encode(_make_frames(1)), other], BytesIO())
+
+    assert "Input 1 has fps" in str(excinfo.value)
+
+
+def test_loop_repeats_frames():
+    originals = _make_frames(3)
+
+    output = BytesIO()
+    editing.loop(_encode(originals), output, 3)
+
+    reia_file, images = _decoded(output)
+    assert reia_file.num_frames == 9
+    for image, expected in zip(images, originals * 3):
+        assert_images_are_same(image, expected)
+
+
+def test_replace_frames_throws_on_non_rgb_frame():
+    with_alpha = Image.new("RGBA", (64, 64))
+
+    with pytest.raises(ValueError) as excinfo:
+        editing.replace_frames(
+            _encode(_make_frames(2)), BytesIO(), 0, 1, [ReiaFrame(with_alpha)]
+        )
+
+    assert "Replacement frame has mode RGBA, expected RGB" in str(excinfo.value)
+
+
+def test_loop_once_copies_file():
+    input = _encode(_make_frames(3))
+
+    output = BytesIO()
+    editing.loop(input, output, 1)
+
+    assert _chunks(output) == _chunks(input)
+
+
+def test_trim_to_empty_range():
+    output = BytesIO()
+    editing.trim(_encode(_make_frames(3)), output, 1, 1)
+
+    reia_file, images = _decoded(output)
+    assert reia_file.num_frames == 0
+    assert images == []
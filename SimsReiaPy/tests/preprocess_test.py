@@ -0,0 +1,86 @@
+from sims_reia import ReiaFrame
+from sims_reia import preprocess
+
+import pytest
+
+from PIL import Image
+
+
+def test_posterize_frames_drops_low_bits():
+    image = Image.new("RGB", (4, 4), color=(0xFF, 0x81, 0x0F))
+
+    frames = list(preprocess.posterize_frames([ReiaFrame(image)], bits=4))
+
+    assert frames[0].image.getpixel((0, 0)) == (0xF0, 0x80, 0x00)
+
+
+def test_posterize_frames_throws_on_invalid_bits():
+    with pytest.raises(ValueError) as excinfo:
+        preprocess.posterize_frames([], bits=0)
+
+    assert "Posterize bits must be between 1 and 8" in str(excinfo.value)
+
+
+def test_palette_frames_limits_number_of_colors():
+    image = Image.new("RGB", (16, 16))
+    for x in range(16):
+        for y in range(16):
+            image.putpixel((x, y), (x * 16, y * 16, 0))
+
+    frames = list(preprocess.palette_frames([ReiaFrame(image)], num_colors=8))
+
+    assert frames[0].image.mode == "RGB"
+    assert len(frames[0].image.getcolors()) <= 8
+
+
+def test_palette_frames_maps_colors_the_same_across_frames():
+    first = Image.new("RGB", (8, 8), color=(255, 0, 0))
+    first.paste((0, 0, 255), (0, 0, 4, 8))
+    # The second frame has a slightly different shade of red which should get
+    # mapped to the same palette color as in the first frame.
+    second = Image.new("RGB", (8, 8), color=(250, 2, 1))
+
+    frames = list(
+        preprocess.palette_frames([ReiaFrame(first), ReiaFrame(second)], num_colors=2)
+    )
+
+    assert frames[0].image.getpixel((7, 7)) == frames[1].image.getpixel((7, 7))
+
+
+def test_palette_frames_samples_colors_from_whole_video():
+    # Fade in from black: the first frame alone only has one color.
+    black = Image.new("RGB", (64, 64))
+    scene = Image.new("RGB", (64, 64), color=(255, 0, 0))
+    scene.paste((0, 0, 255), (0, 0, 32, 64))
+
+    frames = list(
+        preprocess.palette_frames(
+            [ReiaFrame(black)] * 5 + [ReiaFrame(scene)] * 5, num_colors=4
+        )
+    )
+
+    assert frames[0].image.getcolors() == [(64 * 64, (0, 0, 0))]
+    assert sorted(color for _, color in frames[-1].image.getcolors()) == [
+        (0, 0, 255),
+        (255, 0, 0),
+    ]
+
+
+def test_palette_frames_uses_given_palette():
+    palette = preprocess.create_palette(
+        [Image.new("RGB", (8, 8), color=(0, 255, 0))], num_colors=2
+    )
+    red = Image.new("RGB", (8, 8), color=(255, 0, 0))
+
+    frames = list(preprocess.palette_frames([ReiaFrame(red)], 2, palette=palette))
+
+    assert frames[0].image.getpixel((0, 0)) != (255, 0, 0)
+
+
+def test_palette_frames_checks_num_colors_eagerly():
+    palette = preprocess.create_palette([Image.new("RGB", (8, 8))], num_colors=2)
+
+    with pytest.raises(ValueError) as excinfo:
+        preprocess.palette_frames(iter([]), num_colors=99999, palette=palette)
+
+    assert "Number of palette colors must be between 2 and 256" in str(excinfo.value)